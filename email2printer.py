@@ -1,16 +1,18 @@
 import imaplib
-import email
 import os
 import datetime
+import time
+import json
+import re
+import base64
+import quopri
+import tempfile
+import functools
 from io import BytesIO
 import smtplib
-from email.message import EmailMessage
-
-import openpyxl
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter, landscape
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, PageBreak
-from reportlab.pdfbase.pdfmetrics import stringWidth
+import heapq
+from concurrent.futures import ProcessPoolExecutor
+from email.message import EmailMessage, Message
 
 from zoneinfo import ZoneInfo  # Python 3.9+ for time zone support
 
@@ -20,8 +22,17 @@ GMAIL_PASSWORD = os.environ.get("GMAIL_PASSWORD")
 PRINTER_EMAIL = os.environ.get("PRINTER_EMAIL")
 
 SEARCH_PHRASE = "Daily Leads Report"  # Must match the email content exactly
+SEARCH_BYTES = SEARCH_PHRASE.encode()  # Same bytes in any ASCII-compatible charset
 ATTACHMENT_EXT = ".xlsx"             # Excel attachment extension
 TEMP_PDF = "report.pdf"              # Temporary PDF file name
+MAX_ATTACHMENTS = 10                 # Newest attachments kept when more emails match
+MAX_GLYPH_WIDTH = 10.42              # Widest glyph stringWidth() reports for Helvetica 10pt
+CACHE_FILE = os.path.expanduser("~/.e2p_cache.json")  # Verdicts for emails checked by earlier runs
+CACHE_TTL = 4 * 24 * 3600            # Seconds; covers the longest window (Fri 08:00 -> Mon 09:00)
+UID_PATTERN = re.compile(rb"UID (\d+)")
+SECTION_PATTERN = re.compile(rb"BODY\[([\d.]+)\]")
+LITERAL_PATTERN = re.compile(rb"\{\d+\}$")
+IMAP_TOKEN_PATTERN = re.compile(rb'[()]|"(?:[^"\\]|\\.)*"|[^\s()]+')
 
 def connect_imap():
     """Connect to Gmail via IMAP."""
@@ -54,127 +65,454 @@ def get_time_window():
 
 def search_emails(mail, start_time):
     """
-    Search the inbox for emails since the start date.
-    The IMAP 'SINCE' command only uses the date part so extra filtering is done later.
+    Search the inbox for emails since the start date that mention the search phrase
+    and carry an Excel attachment, letting the server drop everything else.
+    The IMAP 'SINCE' command only uses the date part and Gmail's search is not
+    an exact match, so extra filtering is done later.
     """
     mail.select("inbox")
     since_date_str = start_time.strftime("%d-%b-%Y")
-    status, messages = mail.search(None, f'(SINCE "{since_date_str}")')
+    # X-GM-RAW passes Gmail's own search operators through IMAP
+    criteria = (
+        f'(SINCE "{since_date_str}" TEXT "{SEARCH_PHRASE}" '
+        f'X-GM-RAW "has:attachment filename:{ATTACHMENT_EXT.lstrip(".")}")'
+    )
+    # UIDs rather than sequence numbers, so results can be cached across runs
+    status, messages = mail.uid("SEARCH", None, criteria)
     if status != "OK":
         print("No messages found!")
         return []
     email_ids = messages[0].split()
     return email_ids
 
-def get_email_body(msg):
-    """Extract and return the plain text body from the email message."""
-    if msg.is_multipart():
-        for part in msg.walk():
-            if part.get_content_type() == "text/plain":
-                try:
-                    return part.get_payload(decode=True).decode(part.get_content_charset() or 'utf-8')
-                except Exception as e:
-                    print("Error decoding email part:", e)
-                    return ""
+def sequence_set(email_ids):
+    """
+    Build a compact IMAP sequence set from message ids or UIDs, collapsing consecutive
+    runs into ranges, e.g. [1, 3, 4, 5, 7] -> "1,3:5,7".
+    """
+    ids = sorted(int(eid) for eid in email_ids)
+    ranges = []
+    start = prev = ids[0]
+    for eid in ids[1:]:
+        if eid != prev + 1:
+            ranges.append(f"{start}:{prev}" if start != prev else str(start))
+            start = eid
+        prev = eid
+    ranges.append(f"{start}:{prev}" if start != prev else str(start))
+    return ",".join(ranges)
+
+def load_cache():
+    """Load the verdicts for already checked emails, dropping entries older than CACHE_TTL."""
+    try:
+        with open(CACHE_FILE) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict):
+        return {}
+    cutoff = time.time() - CACHE_TTL
+    # Anything that is not a well-formed entry is dropped, like an unreadable file
+    return {
+        key: entry for key, entry in cache.items()
+        if isinstance(entry, dict)
+        and "match" in entry and entry["match"] in (True, False, None)
+        and isinstance(entry.get("ts"), (int, float))
+        and entry["ts"] >= cutoff
+    }
+
+def save_cache(cache):
+    """Write the cache through a temporary file so an interrupted run never leaves it truncated."""
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(CACHE_FILE))
+        with os.fdopen(fd, "w") as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, CACHE_FILE)
+    except OSError as e:
+        print("Error saving email cache:", e)
+
+def response_uid(msg_data, index):
+    """Return the UID of the FETCH response at msg_data[index]."""
+    response = msg_data[index]
+    if isinstance(response, tuple):
+        # The UID may come before or after the message literal
+        trailer = msg_data[index + 1] if index + 1 < len(msg_data) else b""
+        response = response[0] + (trailer if isinstance(trailer, bytes) else b"")
+    match = UID_PATTERN.search(response)
+    return match.group(1) if match else None
+
+def get_arrival_dates(mail, uids):
+    """
+    Return a dict mapping each UID to its arrival time (seconds since the epoch).
+    Only the server's INTERNALDATE is fetched, in one FETCH, so no headers are
+    downloaded or parsed.
+    """
+    arrival_dates = {}
+    status, msg_data = mail.uid("FETCH", sequence_set(uids), "(INTERNALDATE)")
+    if status != "OK":
+        print("Error fetching email dates:", status)
+        return arrival_dates
+    for i, response in enumerate(msg_data):
+        # imaplib returns [None] when none of the UIDs still exist (expunged or moved)
+        if not isinstance(response, bytes):
+            continue
+        # Each line looks like: 1 (UID 42 INTERNALDATE "14-Oct-2026 07:02:13 +0200")
+        date_tuple = imaplib.Internaldate2tuple(response)
+        uid = response_uid(msg_data, i)
+        if date_tuple is None or uid is None:
+            continue
+        arrival_dates[uid] = time.mktime(date_tuple)
+    return arrival_dates
+
+def parse_imap_list(line):
+    """
+    Parse an IMAP response line into nested lists of strings, e.g.
+    b'1 (UID 5 FLAGS (Seen))' -> ['1', ['UID', '5', 'FLAGS', ['Seen']]]. NIL becomes None.
+    """
+    stack = [[]]
+    for token in IMAP_TOKEN_PATTERN.findall(line):
+        if token == b"(":
+            stack.append([])
+        elif token == b")":
+            if len(stack) > 1:
+                closed = stack.pop()
+                stack[-1].append(closed)
+        elif token.startswith(b'"'):
+            stack[-1].append(re.sub(rb'\\(.)', rb'\1', token[1:-1]).decode(errors="replace"))
+        elif token.upper() == b"NIL":
+            stack[-1].append(None)
+        else:
+            stack[-1].append(token.decode(errors="replace"))
+    return stack[0]
+
+def join_fetch_lines(msg_data):
+    """
+    Rebuild one line per message from a FETCH response. imaplib splits out
+    literals ({n} strings) as (envelope, data) tuples; they are put back inline
+    as quoted strings so the line can go through parse_imap_list().
+    """
+    lines = []
+    for response in msg_data:
+        # imaplib returns [None] when none of the UIDs still exist (expunged or moved)
+        if response is None:
+            continue
+        if isinstance(response, tuple):
+            envelope, literal = response
+            quoted = literal.replace(b"\\", b"\\\\").replace(b'"', b'\\"')
+            chunk = LITERAL_PATTERN.sub(b"", envelope) + b'"' + quoted + b'"'
+        else:
+            chunk = response
+        # "<seq> (" opens the next message; anything else continues the current one
+        if chunk[:1].isdigit() or not lines:
+            lines.append(chunk)
+        else:
+            lines[-1] += chunk
+    return lines
+
+def pairs_to_dict(values):
+    """Turn an IMAP parameter list like ['NAME', 'r.xlsx'] into {'name': 'r.xlsx'}."""
+    if not isinstance(values, list):
+        return {}
+    return {str(key).lower(): value for key, value in zip(values[::2], values[1::2])}
+
+def format_params(params):
+    """Render parsed IMAP parameters back as '; key="value"' header parameters."""
+    rendered = ""
+    for key, value in params.items():
+        if value is not None:
+            escaped = str(value).replace("\\", "\\\\").replace('"', '\\"')
+            rendered += f'; {key}="{escaped}"'
+    return rendered
+
+def part_filename(disposition_params, content_type_params):
+    """
+    Return a MIME part's filename the same way email.message.Message.get_filename()
+    does, including RFC 2231 encoded (filename*) and continued (filename*0, ...) values.
+    """
+    headers = Message()
+    headers["Content-Disposition"] = "attachment" + format_params(disposition_params)
+    headers["Content-Type"] = "application/octet-stream" + format_params(content_type_params)
+    return headers.get_filename()
+
+def bodystructure_parts(structure, section=""):
+    """Yield (section, part) for every leaf MIME part of a parsed BODYSTRUCTURE."""
+    if structure and isinstance(structure[0], list):
+        # Multipart: child parts come first, followed by the subtype and extension data
+        number = 0
+        for child in structure:
+            if not isinstance(child, list):
+                break
+            number += 1
+            yield from bodystructure_parts(child, f"{section}.{number}" if section else str(number))
+    elif (len(structure) > 8 and isinstance(structure[8], list)
+          and [str(value).lower() for value in structure[:2]] == ["message", "rfc822"]):
+        # Forwarded email: its body structure follows the envelope, and its parts are
+        # numbered below this part's section; a body that is not multipart is "<section>.1"
+        part_section = section or "1"
+        body = structure[8]
+        if body and isinstance(body[0], list):
+            yield from bodystructure_parts(body, part_section)
+        else:
+            yield from bodystructure_parts(body, f"{part_section}.1")
     else:
-        try:
-            return msg.get_payload(decode=True).decode(msg.get_content_charset() or 'utf-8')
-        except Exception as e:
-            print("Error decoding email:", e)
-            return ""
-    return ""
+        # A message that is not multipart has its body at section 1
+        yield section or "1", structure
 
-def get_attachments(mail, email_ids, start_time, end_time):
+def get_report_parts(mail, uids):
     """
-    Iterate through emails and return a list of Excel attachment data from emails
-    whose Date header (converted to Madrid time) falls within the window AND
-    whose body contains the search phrase.
+    Fetch the BODYSTRUCTURE (the MIME layout, without any content) of each email and
+    return a dict mapping each UID to (text_part, excel_parts). text_part is the first
+    text/plain part and excel_parts the Excel attachments, each as (section, encoding).
     """
-    attachments = []
-    madrid_tz = ZoneInfo("Europe/Madrid")
-    for eid in email_ids:
-        status, msg_data = mail.fetch(eid, "(RFC822)")
-        if status != "OK":
+    report_parts = {}
+    status, msg_data = mail.uid("FETCH", sequence_set(uids), "(BODYSTRUCTURE)")
+    if status != "OK":
+        print("Error fetching email structure:", status)
+        return report_parts
+    for line in join_fetch_lines(msg_data):
+        parsed = parse_imap_list(line)
+        if len(parsed) < 2 or not isinstance(parsed[1], list):
             continue
-        msg = email.message_from_bytes(msg_data[0][1])
-        date_hdr = msg.get("Date")
-        if not date_hdr:
+        fields = pairs_to_dict(parsed[1])
+        uid, structure = fields.get("uid"), fields.get("bodystructure")
+        if uid is None or not isinstance(structure, list):
             continue
-        try:
-            email_date = email.utils.parsedate_to_datetime(date_hdr)
-        except Exception as e:
-            print("Error parsing date:", e)
+        text_part = None
+        excel_parts = []
+        for section, part in bodystructure_parts(structure):
+            if len(part) < 7 or not all(isinstance(value, str) for value in part[:2]):
+                continue
+            content_type = f"{part[0]}/{part[1]}".lower()
+            encoding = (part[5] or "7bit").lower()
+            if text_part is None and content_type == "text/plain":
+                text_part = (section, encoding)
+            # Extension data follows the basic fields; text parts carry an extra line count
+            disposition_index = 9 if part[0].lower() == "text" else 8
+            disposition = part[disposition_index] if len(part) > disposition_index else None
+            if not isinstance(disposition, list) or str(disposition[0]).lower() != "attachment":
+                continue
+            disposition_params = pairs_to_dict(disposition[1] if len(disposition) > 1 else None)
+            filename = part_filename(disposition_params, pairs_to_dict(part[2]))
+            if filename and filename.lower().endswith(ATTACHMENT_EXT):
+                excel_parts.append((section, encoding))
+        report_parts[uid.encode()] = (text_part, excel_parts)
+    return report_parts
+
+def split_fetch_sections(msg_data):
+    """Group a multi-message BODY[section] FETCH response into {uid: {section: data}}."""
+    messages = []
+    for response in msg_data:
+        if response is None:
+            continue
+        envelope = response[0] if isinstance(response, tuple) else response
+        # "<seq> (" opens the next message; the UID may come before or after its literals
+        if envelope[:1].isdigit():
+            messages.append([None, {}])
+        if not messages:
+            continue
+        uid_match = UID_PATTERN.search(envelope)
+        if uid_match:
+            messages[-1][0] = uid_match.group(1)
+        section_match = SECTION_PATTERN.search(envelope)
+        if isinstance(response, tuple) and section_match:
+            messages[-1][1][section_match.group(1).decode()] = response[1]
+    return {uid: sections for uid, sections in messages if uid is not None}
+
+def decode_section(data, encoding):
+    """Undo the Content-Transfer-Encoding of a fetched MIME part."""
+    if encoding == "base64":
+        return base64.b64decode(data)
+    if encoding == "quoted-printable":
+        return quopri.decodestring(data)
+    return data
+
+def get_attachments(mail, email_ids, start_time, end_time):
+    """
+    Iterate through emails and return a list of Excel attachment data from emails
+    received within the window AND whose body contains the search phrase.
+    Arrival dates are checked first, then the MIME layout, so only the text body and
+    Excel parts of emails inside the window are downloaded.
+    Emails checked by earlier runs are looked up in the local cache instead of fetched again.
+    At most MAX_ATTACHMENTS attachments are returned: the newest ones, oldest first.
+    """
+    # UIDs are only stable while the mailbox's UIDVALIDITY stays the same, so it is part
+    # of every cache key; without it (left by select() in search_emails) the cache is
+    # neither loaded nor saved
+    uidvalidity = mail.response("UIDVALIDITY")[1][0]
+    cache = load_cache() if uidvalidity else {}
+
+    def cache_key(uid):
+        return f"{(uidvalidity or b'').decode()}:{uid.decode()}"
+
+    arrival_dates = {}
+    unknown_uids = []
+    for uid in email_ids:
+        entry = cache.get(cache_key(uid))
+        if entry is None:
+            unknown_uids.append(uid)
+        elif entry["match"] is not False:
+            arrival_dates[uid] = entry["ts"]
+    if unknown_uids:
+        new_dates = get_arrival_dates(mail, unknown_uids)
+        for uid, email_ts in new_dates.items():
+            cache[cache_key(uid)] = {"match": None, "ts": email_ts}
+        arrival_dates.update(new_dates)
+
+    start_ts = start_time.timestamp()
+    end_ts = end_time.timestamp()
+    recent_dates = {uid: ts for uid, ts in arrival_dates.items() if start_ts <= ts < end_ts}
+    if not recent_dates:
+        if uidvalidity:
+            save_cache(cache)
+        return []
+    # Min-heap of (date, arrival order, data): the oldest attachment is evicted once
+    # the cap is exceeded, so memory stays bounded however many emails match
+    heap = []
+    skipped = 0
+    # Only the text body and Excel parts are downloaded, never the rest of the email.
+    # Emails with the same layout (usually all of them) share a single FETCH.
+    layouts = {}
+    for uid, (text_part, excel_parts) in get_report_parts(mail, recent_dates).items():
+        if uid not in recent_dates:
             continue
-        # Convert email date to Madrid time
-        email_date_madrid = email_date.astimezone(madrid_tz)
-        if not (start_time <= email_date_madrid < end_time):
+        # Not cached as a non-match: this verdict rests only on the MIME layout, so the
+        # email is looked at again on the next run rather than skipped for good
+        if text_part is None or not excel_parts:
             continue
-        # Check if the email body contains the search phrase
-        body = get_email_body(msg)
-        if SEARCH_PHRASE not in body:
+        layouts.setdefault((text_part, *excel_parts), []).append(uid)
+    for parts, uids in layouts.items():
+        # BODY.PEEK leaves the \Seen flag untouched
+        items = " ".join(f"BODY.PEEK[{section}]" for section, _ in parts)
+        status, msg_data = mail.uid("FETCH", sequence_set(uids), f"({items})")
+        if status != "OK":
+            print("Error fetching emails:", status)
             continue
-        # Look for an Excel attachment
-        for part in msg.walk():
-            if part.get_content_disposition() == "attachment":
-                filename = part.get_filename()
-                if filename and filename.lower().endswith(ATTACHMENT_EXT):
-                    attachments.append(part.get_payload(decode=True))
-    return attachments
+        for uid, sections in split_fetch_sections(msg_data).items():
+            if uid not in recent_dates or any(section not in sections for section, _ in parts):
+                continue
+            email_date = recent_dates[uid]
+            (text_section, text_encoding), excel_parts = parts[0], parts[1:]
+            # The phrase is matched on the decoded body bytes, without a charset decode
+            body = decode_section(sections[text_section], text_encoding)
+            matched = SEARCH_BYTES in body
+            cache[cache_key(uid)] = {"match": matched, "ts": email_date}
+            if not matched:
+                continue
+            for section, encoding in excel_parts:
+                excel_data = decode_section(sections[section], encoding)
+                heapq.heappush(heap, (email_date, len(heap) + skipped, excel_data))
+                if len(heap) > MAX_ATTACHMENTS:
+                    heapq.heappop(heap)
+                    skipped += 1
+    if uidvalidity:
+        save_cache(cache)
+    if skipped:
+        print(f"Skipping {skipped} older attachment(s); only the newest {MAX_ATTACHMENTS} are printed.")
+    return [excel_data for _, _, excel_data in sorted(heap)]
 
 
+def read_excel_rows(excel_data):
+    """
+    Read the first sheet of an Excel file and return its cells as a list of rows of plain text.
+    All rows are padded to the same length; empty cells become "".
+    """
+    import openpyxl
+
+    # read_only streams the sheet XML instead of building the full workbook in memory
+    wb = openpyxl.load_workbook(BytesIO(excel_data), data_only=True, read_only=True)
+    ws = wb.active
+    # Read-only mode trusts the <dimension> stored in the sheet, which some exporters
+    # write wrongly (e.g. "A1"); forget it so every stored row and column is read
+    ws.reset_dimensions()
+    raw_data = []
+    for row in ws.iter_rows(values_only=True):
+        raw_data.append([str(cell) if cell is not None else "" for cell in row])
+    wb.close()
+    # Without trusted dimensions rows come back as long as their last stored cell; pad them out
+    num_cols = max((len(row) for row in raw_data), default=0)
+    for row in raw_data:
+        row.extend([""] * (num_cols - len(row)))
+    return raw_data
+
+@functools.lru_cache(maxsize=None)
+def get_normal_style():
+    """Return the Normal paragraph style, built once and used for every table cell."""
+    from reportlab.lib.styles import getSampleStyleSheet
+    return getSampleStyleSheet()["Normal"]
+
+def build_table(raw_data):
+    """Build a styled ReportLab table from rows of plain text."""
+    from reportlab.lib import colors
+    from reportlab.platypus import Table, TableStyle, Paragraph
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+
+    normal_style = get_normal_style()
+    num_cols = len(raw_data[0]) if raw_data else 0
+    available_width = 792 - 60  # Landscape letter width minus left/right margins
+    max_col_width = available_width / num_cols if num_cols > 0 else 100
+
+    # Single pass: wrap each cell's text in a Paragraph for automatic text wrapping
+    # while tracking the widest plain text per column.
+    text_widths = {}  # Measure each distinct value once; report columns repeat many values
+    col_max = [0] * num_cols
+    capped_width = max_col_width - 10  # Text this wide already fills a column
+    data = []
+    for row in raw_data:
+        new_row = []
+        for i, cell in enumerate(row):
+            # Only measure text that could widen the column: skip columns already at
+            # the cap and cells too short to beat the current maximum even if every
+            # character were the widest glyph. The resulting widths stay exact.
+            if col_max[i] < capped_width and len(cell) * MAX_GLYPH_WIDTH > col_max[i]:
+                width = text_widths.get(cell)
+                if width is None:
+                    width = text_widths[cell] = stringWidth(cell, 'Helvetica', 10)
+                if width > col_max[i]:
+                    col_max[i] = width
+            # Empty cells skip Paragraph's markup parser; an empty flowable list
+            # lays out exactly like an empty Paragraph
+            new_row.append(Paragraph(cell, normal_style) if cell else [])
+        data.append(new_row)
+
+    # Column widths follow the plain text, capped by available width.
+    col_widths = [min(width + 10, max_col_width) for width in col_max]
+
+    table = Table(data, colWidths=col_widths)
+    style = TableStyle([
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ])
+    table.setStyle(style)
+    return table
 
 def convert_multiple_excels_to_pdf(excel_data_list):
     """
     Convert each Excel attachment (first sheet) to a table and combine them into a single PDF.
     Tables are placed sequentially with a small spacer between them, allowing multiple tables per page.
     """
-    from reportlab.platypus import Paragraph, Spacer
-    from reportlab.lib.styles import getSampleStyleSheet
-    styles = getSampleStyleSheet()
-    normal_style = styles["Normal"]
+    # openpyxl and ReportLab are imported inside the conversion functions, not at
+    # module level, so runs that find no attachments skip their startup cost
+    from reportlab.lib.pagesizes import letter, landscape
+    from reportlab.platypus import SimpleDocTemplate, Spacer
 
+    # Each table keeps its cell data until doc.build() has laid it out and
+    # dropped it from the elements list.
+    # Several workbooks are parsed in parallel worker processes while the tables are
+    # built here, since ReportLab flowables cannot be sent between processes. A single
+    # workbook (the usual case) is parsed in-process, where a pool would only add overhead.
     elements = []
-    for excel_data in excel_data_list:
-        wb = openpyxl.load_workbook(BytesIO(excel_data), data_only=True)
-        ws = wb.active
-
-        # Extract worksheet data into a list of lists (as plain text)
-        raw_data = []
-        for row in ws.iter_rows(values_only=True):
-            raw_data.append([str(cell) if cell is not None else "" for cell in row])
-        
-        # Wrap each cell's text in a Paragraph for automatic text wrapping
-        data = []
-        for row in raw_data:
-            new_row = []
-            for cell in row:
-                new_row.append(Paragraph(cell, normal_style))
-            data.append(new_row)
-        
-        # Calculate column widths based on the plain text, capped by available width.
-        col_widths = []
-        if raw_data:
-            num_cols = len(raw_data[0])
-        else:
-            num_cols = 0
-        available_width = 792 - 60  # Landscape letter width minus left/right margins
-        max_col_width = available_width / num_cols if num_cols > 0 else 100
-
-        for col in zip(*raw_data):
-            calculated_width = max([stringWidth(str(item), 'Helvetica', 10) for item in col] + [0]) + 10
-            col_widths.append(min(calculated_width, max_col_width))
-        
-        table = Table(data, colWidths=col_widths)
-        style = TableStyle([
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ])
-        table.setStyle(style)
-        elements.append(table)
+    if len(excel_data_list) == 1:
+        elements.append(build_table(read_excel_rows(excel_data_list[0])))
         # Add a small spacer between tables instead of a page break
         elements.append(Spacer(1, 12))
-    
+    else:
+        import openpyxl  # Loaded once here so forked workers inherit it
+        max_workers = min(len(excel_data_list), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            for raw_data in executor.map(read_excel_rows, excel_data_list):
+                elements.append(build_table(raw_data))
+                elements.append(Spacer(1, 12))
+
     doc = SimpleDocTemplate(
         TEMP_PDF,
         pagesize=landscape(letter),
@@ -183,8 +521,6 @@ def convert_multiple_excels_to_pdf(excel_data_list):
     )
     doc.build(elements)
 
-
-
 def send_email(pdf_path):
     """Send an email with the PDF attached."""
     msg = EmailMessage()
@@ -195,14 +531,13 @@ def send_email(pdf_path):
     msg["To"] = ", ".join(recipients)
     msg.set_content("This email is to be printed.")
 
-    
+    # Encode straight from the file so the raw PDF bytes are freed once base64-encoded
     with open(pdf_path, "rb") as f:
-        pdf_data = f.read()
-    msg.add_attachment(pdf_data, maintype="application", subtype="pdf", filename="report.pdf")
+        msg.add_attachment(f.read(), maintype="application", subtype="pdf", filename="report.pdf")
 
     try:
-        server = smtplib.SMTP("smtp.gmail.com", 587)
-        server.starttls()
+        # Implicit TLS on 465 skips the extra EHLO/STARTTLS round-trips of port 587
+        server = smtplib.SMTP_SSL("smtp.gmail.com", 465)
         server.login(GMAIL_USER, GMAIL_PASSWORD)
         server.send_message(msg)
         server.quit()
@@ -222,12 +557,17 @@ def main():
 
         start_time, end_time = get_time_window()
         mail = connect_imap()
-        email_ids = search_emails(mail, start_time)
-        if not email_ids:
-            print("No emails found matching the criteria.")
-            return
+        # The IMAP session is only needed to collect attachments; close it before
+        # the PDF work instead of holding the connection open until exit
+        try:
+            email_ids = search_emails(mail, start_time)
+            if not email_ids:
+                print("No emails found matching the criteria.")
+                return
 
-        attachment_list = get_attachments(mail, email_ids, start_time, end_time)
+            attachment_list = get_attachments(mail, email_ids, start_time, end_time)
+        finally:
+            mail.logout()
         if not attachment_list:
             print("No valid Excel attachments found in the specified time window.")
             return
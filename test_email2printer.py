@@ -0,0 +1,314 @@
+"""
+Checks for the IMAP response parsing in email2printer.py, fed with FETCH responses
+shaped like Gmail's (as returned by imaplib). Run with: python -m unittest
+"""
+import base64
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import email2printer as e2p
+
+XLSX_TYPE = b'"APPLICATION" "VND.OPENXMLFORMATS-OFFICEDOCUMENT.SPREADSHEETML.SHEET"'
+
+# multipart/mixed > (multipart/alternative > text/plain, text/html), xlsx attachment
+NESTED_BODYSTRUCTURE = (
+    b'12 (UID 42 BODYSTRUCTURE ((('
+    b'"TEXT" "PLAIN" ("CHARSET" "UTF-8") NIL NIL "QUOTED-PRINTABLE" 120 4 NIL NIL NIL NIL)('
+    b'"TEXT" "HTML" ("CHARSET" "UTF-8") NIL NIL "QUOTED-PRINTABLE" 300 8 NIL NIL NIL NIL) '
+    b'"ALTERNATIVE" ("BOUNDARY" "000a") NIL NIL NIL)(' + XLSX_TYPE + b' ("NAME" "Daily.xlsx") '
+    b'"<f_1>" NIL "BASE64" 9000 NIL ("ATTACHMENT" ("FILENAME" "Daily.xlsx")) NIL NIL) '
+    b'"MIXED" ("BOUNDARY" "000b") NIL NIL NIL))'
+)
+
+
+def attachment_structure(uid, disposition_params):
+    """BODYSTRUCTURE line for text/plain + xlsx attachment with the given disposition parameters."""
+    return (
+        f'{uid} (UID {uid} BODYSTRUCTURE (('.encode() +
+        b'"TEXT" "PLAIN" ("CHARSET" "UTF-8") NIL NIL "7BIT" 40 2 NIL NIL NIL NIL)(' + XLSX_TYPE +
+        b' NIL NIL NIL "BASE64" 9000 NIL ("ATTACHMENT" (' + disposition_params + b')) NIL NIL) '
+        b'"MIXED" ("BOUNDARY" "000c") NIL NIL NIL))'
+    )
+
+
+class FakeMail:
+    """Minimal stand-in for imaplib.IMAP4_SSL that replays canned UID FETCH responses."""
+
+    def __init__(self, responses, uidvalidity=None):
+        self.responses = responses  # FETCH item string -> msg_data
+        self.uidvalidity = uidvalidity
+        self.fetches = []
+
+    def uid(self, command, message_set, items):
+        self.fetches.append((message_set, items))
+        return "OK", self.responses[items]
+
+    def response(self, code):
+        return code, [self.uidvalidity]
+
+
+class ParseImapListTest(unittest.TestCase):
+    def test_nested_lists_nil_and_quoted_strings(self):
+        parsed = e2p.parse_imap_list(b'7 (UID 9 FLAGS () X ("a \\"b\\"" NIL (1 2)))')
+        self.assertEqual(parsed, ["7", ["UID", "9", "FLAGS", [], "X", ['a "b"', None, ["1", "2"]]]])
+
+    def test_join_fetch_lines_inlines_literals(self):
+        msg_data = [
+            (b'3 (UID 8 BODYSTRUCTURE ("TEXT" "PLAIN" ("NAME" {9}', b'a "q".txt'),
+            b') NIL NIL "7BIT" 1 1 NIL NIL NIL NIL))',
+            b'4 (UID 9 BODYSTRUCTURE ("TEXT" "PLAIN" NIL NIL NIL "7BIT" 1 1 NIL NIL NIL NIL))',
+        ]
+        lines = e2p.join_fetch_lines(msg_data)
+        self.assertEqual(len(lines), 2)
+        fields = e2p.pairs_to_dict(e2p.parse_imap_list(lines[0])[1])
+        self.assertEqual(fields["uid"], "8")
+        self.assertEqual(fields["bodystructure"][2], ["NAME", 'a "q".txt'])
+
+
+class BodystructureTest(unittest.TestCase):
+    def test_nested_multipart_sections(self):
+        structure = e2p.pairs_to_dict(e2p.parse_imap_list(NESTED_BODYSTRUCTURE)[1])["bodystructure"]
+        sections = [(section, part[1]) for section, part in e2p.bodystructure_parts(structure)]
+        self.assertEqual(sections, [
+            ("1.1", "PLAIN"), ("1.2", "HTML"),
+            ("2", "VND.OPENXMLFORMATS-OFFICEDOCUMENT.SPREADSHEETML.SHEET"),
+        ])
+
+    def test_forwarded_email_parts(self):
+        envelope = (
+            b'("Tue, 13 Oct 2026 08:00:00 +0200" "Daily Leads Report" '
+            b'(("CRM" NIL "crm" "example.com")) NIL NIL NIL NIL NIL NIL "<m1@example.com>")'
+        )
+        text_part = b'("TEXT" "PLAIN" ("CHARSET" "UTF-8") NIL NIL "7BIT" 20 1 NIL NIL NIL NIL)'
+        xlsx_part = (
+            b'(' + XLSX_TYPE + b' NIL NIL NIL "BASE64" 9000 NIL '
+            b'("ATTACHMENT" ("FILENAME" "Daily.xlsx")) NIL NIL)'
+        )
+        forwarded_multipart = (
+            b'("MESSAGE" "RFC822" NIL NIL NIL "7BIT" 12000 ' + envelope + b' (' + text_part +
+            xlsx_part + b' "MIXED" ("BOUNDARY" "in") NIL NIL NIL) 200 NIL NIL NIL NIL)'
+        )
+        line = b'1 (UID 8 BODYSTRUCTURE (' + text_part + forwarded_multipart + b' "MIXED" NIL NIL NIL))'
+        mail = FakeMail({"(BODYSTRUCTURE)": [line]})
+        self.assertEqual(
+            e2p.get_report_parts(mail, [b"8"]),
+            {b"8": (("1", "7bit"), [("2.2", "base64")])},
+        )
+
+        # A forwarded email that is not multipart keeps its body at "<section>.1"
+        forwarded_single = (
+            b'("MESSAGE" "RFC822" NIL NIL NIL "7BIT" 300 ' + envelope + b' ' + text_part +
+            b' 5 NIL NIL NIL NIL)'
+        )
+        line = b'1 (UID 9 BODYSTRUCTURE (' + forwarded_single + xlsx_part + b' "MIXED" NIL NIL NIL))'
+        mail = FakeMail({"(BODYSTRUCTURE)": [line]})
+        self.assertEqual(
+            e2p.get_report_parts(mail, [b"9"]),
+            {b"9": (("1.1", "7bit"), [("2", "base64")])},
+        )
+
+    def test_single_part_message_is_section_1(self):
+        line = (
+            b'1 (UID 3 BODYSTRUCTURE '
+            b'("TEXT" "PLAIN" ("CHARSET" "US-ASCII") NIL NIL "7BIT" 5 1 NIL NIL NIL NIL))'
+        )
+        mail = FakeMail({"(BODYSTRUCTURE)": [line]})
+        self.assertEqual(e2p.get_report_parts(mail, [b"3"]), {b"3": (("1", "7bit"), [])})
+
+    def test_report_parts_of_nested_message(self):
+        mail = FakeMail({"(BODYSTRUCTURE)": [NESTED_BODYSTRUCTURE]})
+        self.assertEqual(
+            e2p.get_report_parts(mail, [b"42"]),
+            {b"42": (("1.1", "quoted-printable"), [("2", "base64")])},
+        )
+
+    def test_literal_encoded_filename(self):
+        line = attachment_structure(5, b'"FILENAME" \x00')
+        head, tail = line.split(b"\x00")
+        filename = "Informe díario.xlsx".encode()
+        msg_data = [(head + b"{%d}" % len(filename), filename), tail]
+        mail = FakeMail({"(BODYSTRUCTURE)": msg_data})
+        self.assertEqual(e2p.get_report_parts(mail, [b"5"])[b"5"][1], [("2", "base64")])
+
+    def test_rfc2231_filenames(self):
+        for params in (
+            b'"FILENAME*" "utf-8\'\'Informe%20diario.xlsx"',
+            b'"FILENAME*0" "Informe " "FILENAME*1" "diario.xlsx"',
+            b'"FILENAME*0*" "utf-8\'\'Informe%20" "FILENAME*1*" "di%C3%A1rio.xlsx"',
+        ):
+            mail = FakeMail({"(BODYSTRUCTURE)": [attachment_structure(6, params)]})
+            self.assertEqual(e2p.get_report_parts(mail, [b"6"])[b"6"][1], [("2", "base64")], params)
+
+    def test_no_data_for_vanished_uids(self):
+        mail = FakeMail({"(BODYSTRUCTURE)": [None]})
+        self.assertEqual(e2p.get_report_parts(mail, [b"5"]), {})
+
+    def test_other_attachments_are_ignored(self):
+        mail = FakeMail({"(BODYSTRUCTURE)": [attachment_structure(7, b'"FILENAME" "notes.pdf"')]})
+        self.assertEqual(e2p.get_report_parts(mail, [b"7"])[b"7"][1], [])
+
+
+class FetchSectionsTest(unittest.TestCase):
+    def test_uid_before_and_after_literals(self):
+        msg_data = [
+            (b"101 (UID 1 BODY[1] {5}", b"hello"),
+            (b" BODY[2] {4}", b"QUJD"),
+            b")",
+            (b"102 (BODY[1] {3}", b"bye"),
+            (b" BODY[2] {4}", b"REVG"),
+            b" UID 2)",
+        ]
+        self.assertEqual(e2p.split_fetch_sections(msg_data), {
+            b"1": {"1": b"hello", "2": b"QUJD"},
+            b"2": {"1": b"bye", "2": b"REVG"},
+        })
+
+    def test_no_data_for_vanished_uids(self):
+        self.assertEqual(e2p.split_fetch_sections([None]), {})
+
+    def test_decode_section(self):
+        self.assertEqual(e2p.decode_section(b"QUJD\r\nREVG\r\n", "base64"), b"ABCDEF")
+        self.assertEqual(
+            e2p.decode_section(b"Daily=20Leads=\r\n Report", "quoted-printable"),
+            b"Daily Leads Report",
+        )
+        self.assertEqual(e2p.decode_section(b"plain", "7bit"), b"plain")
+
+
+class ArrivalDatesTest(unittest.TestCase):
+    def test_internaldate_per_uid(self):
+        mail = FakeMail({"(INTERNALDATE)": [
+            b'1 (UID 6 INTERNALDATE "14-Oct-2026 07:02:13 +0200")',
+            b'2 (INTERNALDATE "14-Oct-2026 08:00:00 +0200" UID 9)',
+        ]})
+        dates = e2p.get_arrival_dates(mail, [b"6", b"9"])
+        self.assertEqual(dates[b"9"] - dates[b"6"], 57 * 60 + 47)
+
+    def test_no_data_for_vanished_uids(self):
+        # A UID FETCH for messages expunged since the SEARCH returns ("OK", [None])
+        mail = FakeMail({"(INTERNALDATE)": [None]})
+        self.assertEqual(e2p.get_arrival_dates(mail, [b"5"]), {})
+
+
+class GetAttachmentsTest(unittest.TestCase):
+    def test_rfc2231_report_is_fetched_and_returned(self):
+        text = b"Here is your Daily Leads Report"
+        excel = base64.encodebytes(b"XLSX-DATA")
+        mail = FakeMail({
+            "(INTERNALDATE)": [b'1 (UID 6 INTERNALDATE "14-Oct-2026 07:02:13 +0200")'],
+            "(BODYSTRUCTURE)": [
+                attachment_structure(6, b'"FILENAME*" "utf-8\'\'Informe%20diario.xlsx"'),
+            ],
+            "(BODY.PEEK[1] BODY.PEEK[2])": [
+                (b"1 (UID 6 BODY[1] {%d}" % len(text), text),
+                (b" BODY[2] {%d}" % len(excel), excel),
+                b")",
+            ],
+        })
+        start = e2p.datetime.datetime(2026, 10, 13, 8, 0, tzinfo=e2p.ZoneInfo("Europe/Madrid"))
+        end = e2p.datetime.datetime(2026, 10, 14, 9, 0, tzinfo=e2p.ZoneInfo("Europe/Madrid"))
+        self.assertEqual(e2p.get_attachments(mail, [b"6"], start, end), [b"XLSX-DATA"])
+        self.assertEqual(mail.fetches[-1], ("6", "(BODY.PEEK[1] BODY.PEEK[2])"))
+
+    def test_uids_vanishing_before_the_body_fetch(self):
+        mail = FakeMail({
+            "(INTERNALDATE)": [b'1 (UID 6 INTERNALDATE "14-Oct-2026 07:02:13 +0200")'],
+            "(BODYSTRUCTURE)": [None],
+        })
+        start = e2p.datetime.datetime(2026, 10, 13, 8, 0, tzinfo=e2p.ZoneInfo("Europe/Madrid"))
+        end = e2p.datetime.datetime(2026, 10, 14, 9, 0, tzinfo=e2p.ZoneInfo("Europe/Madrid"))
+        self.assertEqual(e2p.get_attachments(mail, [b"6"], start, end), [])
+
+
+class CacheTest(unittest.TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        cache_file = os.path.join(tmp_dir.name, "cache.json")
+        patcher = mock.patch.object(e2p, "CACHE_FILE", cache_file)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        now = e2p.datetime.datetime.now(e2p.ZoneInfo("Europe/Madrid"))
+        self.start = now - e2p.datetime.timedelta(hours=1)
+        self.end = now + e2p.datetime.timedelta(hours=1)
+
+    def write_cache(self, content):
+        with open(e2p.CACHE_FILE, "w") as f:
+            f.write(content if isinstance(content, str) else json.dumps(content))
+
+    def read_cache(self):
+        with open(e2p.CACHE_FILE) as f:
+            return json.load(f)
+
+    def test_missing_or_malformed_file_loads_empty(self):
+        self.assertEqual(e2p.load_cache(), {})
+        for content in ("{not json", "[1, 2]", '"text"', "null"):
+            self.write_cache(content)
+            self.assertEqual(e2p.load_cache(), {}, content)
+
+    def test_malformed_entries_are_dropped(self):
+        now = time.time()
+        self.write_cache({
+            "1:1": {"match": True, "ts": now},
+            "1:2": "not an entry",
+            "1:3": {"ts": now},
+            "1:4": {"match": "yes", "ts": now},
+            "1:5": {"match": None, "ts": "today"},
+            "1:6": {"match": None, "ts": now},
+        })
+        self.assertEqual(e2p.load_cache(), {
+            "1:1": {"match": True, "ts": now},
+            "1:6": {"match": None, "ts": now},
+        })
+
+    def test_expired_entries_are_dropped(self):
+        now = time.time()
+        self.write_cache({
+            "1:1": {"match": True, "ts": now - e2p.CACHE_TTL - 60},
+            "1:2": {"match": False, "ts": now - e2p.CACHE_TTL + 60},
+        })
+        self.assertEqual(list(e2p.load_cache()), ["1:2"])
+
+    def test_known_non_match_is_not_fetched(self):
+        self.write_cache({"77:6": {"match": False, "ts": time.time()}})
+        mail = FakeMail({}, uidvalidity=b"77")
+        self.assertEqual(e2p.get_attachments(mail, [b"6"], self.start, self.end), [])
+        self.assertEqual(mail.fetches, [])
+
+    def test_known_dates_skip_only_the_date_fetch(self):
+        for match in (None, True):
+            self.write_cache({"77:6": {"match": match, "ts": time.time()}})
+            mail = FakeMail({"(BODYSTRUCTURE)": [attachment_structure(6, b'"FILENAME" "notes.pdf"')]},
+                            uidvalidity=b"77")
+            self.assertEqual(e2p.get_attachments(mail, [b"6"], self.start, self.end), [])
+            self.assertEqual(mail.fetches, [("6", "(BODYSTRUCTURE)")], match)
+
+    def test_other_uidvalidity_is_not_reused(self):
+        self.write_cache({"76:6": {"match": False, "ts": time.time()}})
+        mail = FakeMail({"(INTERNALDATE)": [None]}, uidvalidity=b"77")
+        e2p.get_attachments(mail, [b"6"], self.start, self.end)
+        self.assertEqual(mail.fetches, [("6", "(INTERNALDATE)")])
+
+    def test_verdicts_are_saved(self):
+        text = b"No report today"
+        excel = base64.encodebytes(b"XLSX-DATA")
+        arrival = e2p.imaplib.Time2Internaldate(time.time()).encode()
+        mail = FakeMail({
+            "(INTERNALDATE)": [b"1 (UID 6 INTERNALDATE " + arrival + b")"],
+            "(BODYSTRUCTURE)": [attachment_structure(6, b'"FILENAME" "Daily.xlsx"')],
+            "(BODY.PEEK[1] BODY.PEEK[2])": [
+                (b"1 (UID 6 BODY[1] {%d}" % len(text), text),
+                (b" BODY[2] {%d}" % len(excel), excel),
+                b")",
+            ],
+        }, uidvalidity=b"77")
+        self.assertEqual(e2p.get_attachments(mail, [b"6"], self.start, self.end), [])
+        self.assertIs(self.read_cache()["77:6"]["match"], False)
+
+
+if __name__ == "__main__":
+    unittest.main()